@@ -26,7 +26,7 @@ class Auth:
         if self._fail_retry_delay == 0:
             return
 
-        now = asyncio.get_event_loop().time()
+        now = asyncio.get_running_loop().time()
 
         if (
             len(self._rate_limit_ip_to_due) >= _CLEAN_RATE_LIMIT_THRESHOLD
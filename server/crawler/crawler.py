@@ -1,14 +1,45 @@
 import abc
+import email.utils
 import random
 import logging
+import time
 from typing import Mapping
 from dataclasses import is_dataclass, asdict
+
+import aiohttp
+
 from .step import Step
 
 
 _log = logging.getLogger(__name__)
 
 ERROR_DELAYS = [30, 60, 10 * 60, 60 * 60, 12 * 60 * 60, 24 * 60 * 60, 7 * 24 * 60 * 60]
+RATE_LIMITED_STATUS = (429, 503)
+
+
+def _retry_after(exc):
+    # Seconds the server asked us to wait before retrying, if it told us at all.
+    # The header may either contain the amount of seconds or an HTTP date.
+    if not isinstance(exc, aiohttp.ClientResponseError):
+        return None
+    if exc.status not in RATE_LIMITED_STATUS or not exc.headers:
+        return None
+
+    value = exc.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(int(date.timestamp() - time.time()), 0)
 
 
 class Crawler(abc.ABC):
@@ -78,8 +109,10 @@ class Crawler(abc.ABC):
 
         try:
             step = await cls._step(values, stage, session)
-        except Exception:
+        except Exception as e:
+            # Honor the server's delay when rate-limited, but never retry sooner than usual
             delay = ERROR_DELAYS[min(error, len(ERROR_DELAYS) - 1)]
+            delay = max(delay, _retry_after(e) or 0)
             error += 1
             _log.exception(
                 "%d consecutive unhandled exception(s) stepping %s, delay for %ds",
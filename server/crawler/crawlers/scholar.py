@@ -1,5 +1,6 @@
 import asyncio
 import codecs
+import functools
 import random
 import re
 import logging
@@ -8,6 +9,7 @@ from typing import AsyncGenerator, Optional, List
 
 import aiohttp
 import bs4
+import soupsieve
 
 from ...storage import Author, Publication
 from ..crawler import Crawler
@@ -49,16 +51,48 @@ _URL_PUBLICATION = "/citations?view_op=view_citation&hl=en&citation_for_view={}"
 _USER_RE = re.compile(r"user=([^&]+)")
 _CITATION_RE = re.compile(r"citation_for_view=([\w-]*:[\w-]*)")
 
+# Selectors used on every page (or row) are compiled once
+_AUTHOR_NAME_SEL = soupsieve.compile("h3.gs_ai_name")
+_AUTHOR_AFFILIATION_SEL = soupsieve.compile("div.gs_ai_aff")
+_AUTHOR_EMAIL_SEL = soupsieve.compile("div.gs_ai_eml")
+_AUTHOR_INTEREST_SEL = soupsieve.compile("a.gs_ai_one_int")
+_AUTHOR_CITED_BY_SEL = soupsieve.compile("div.gs_ai_cby")
+_PROFILE_INTEREST_SEL = soupsieve.compile("a.gsc_prf_inta")
+_PROFILE_INDEX_SEL = soupsieve.compile("td.gsc_rsb_std")
+_PROFILE_YEAR_SEL = soupsieve.compile("span.gsc_g_t")
+_PROFILE_YEAR_CITES_SEL = soupsieve.compile("span.gsc_g_al")
+_PROFILE_COAUTHOR_SEL = soupsieve.compile("span.gsc_rsb_a_desc")
+_PUB_ROW_SEL = soupsieve.compile("tr.gsc_a_tr")
+_PUB_MORE_SEL = soupsieve.compile("button#gsc_bpf_more")
+_PUB_LINK_SEL = soupsieve.compile("a.gsc_a_at")
+_PUB_DETAILS_SEL = soupsieve.compile("td.gsc_a_t div.gs_gray")
+_PUB_CITES_SEL = soupsieve.compile(".gsc_a_ac")
+_PUB_YEAR_SEL = soupsieve.compile(".gsc_a_h")
+_CITATION_ROW_SEL = soupsieve.compile("div.gs_or")
+
+# Further publication pages only need the rows and the "show more" button,
+# so the rest of the profile does not need to be built into the tree at all.
+_PUBLICATIONS_STRAINER = bs4.SoupStrainer(["tr", "button"])
+
+
+def _text(soup) -> str:
+    # Scholar uses non-breaking spaces here and there, but we want plain spaces. Only the
+    # text that is extracted needs to be replaced, and not the entire page.
+    return soup.text.replace("\xa0", " ")
+
 
 async def _get_page(
-    session: aiohttp.ClientSession, path: str = "", url: str = None
+    session: aiohttp.ClientSession,
+    path: str = "",
+    url: str = None,
+    parse_only: bs4.SoupStrainer = None,
 ) -> bs4.BeautifulSoup:
     if not url:
         url = _HOST + path
 
     async with session.get(url, headers=_HEADERS) as resp:
         resp.raise_for_status()
-        html = (await resp.text()).replace("\xa0", " ")
+        html = await resp.text()
 
         if 'id="gs_captcha_f"' in html:
             new_cookies = []
@@ -72,23 +106,27 @@ async def _get_page(
 
             raise RuntimeError("hit captcha while crawling google scholar")
 
-        return bs4.BeautifulSoup(html, "html.parser")
+    # Parsing a profile page takes long enough that other steps (and the web server)
+    # would notice, so it's done in a thread while the event loop keeps running them.
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(bs4.BeautifulSoup, html, "lxml", parse_only=parse_only)
+    )
 
 
 def _analyze_basic_author_soup(soup) -> dict:
-    name_soup = soup.find("h3", "gs_ai_name")
-    name = name_soup.text
+    name_soup = _AUTHOR_NAME_SEL.select_one(soup)
+    name = _text(name_soup)
     author_id = _USER_RE.search(name_soup.find("a")["href"]).group(1)
     url_picture = _HOST + "/citations?view_op=medium_photo&user={}".format(author_id)
-    affiliation = soup.find("div", "gs_ai_aff").text
+    affiliation = _text(_AUTHOR_AFFILIATION_SEL.select_one(soup))
 
-    email = soup.find("div", "gs_ai_eml").text
+    email = _text(_AUTHOR_EMAIL_SEL.select_one(soup))
     if email:
         email = email.replace("Verified email at ", "")
 
-    interests = [i.text.strip() for i in soup.find_all("a", "gs_ai_one_int")]
+    interests = [_text(i).strip() for i in _AUTHOR_INTEREST_SEL.select(soup)]
 
-    cited_by = soup.find("div", "gs_ai_cby").text
+    cited_by = _text(_AUTHOR_CITED_BY_SEL.select_one(soup))
     if cited_by:
         cited_by = int(cited_by.replace("Cited by ", ""))
     else:
@@ -106,18 +144,19 @@ def _analyze_basic_author_soup(soup) -> dict:
 
 
 def _analyze_basic_publication_soup(soup) -> Publication:
-    name = soup.find("a", "gsc_a_at").text
-    authors, publisher = soup.find("td", "gsc_a_t")("div", "gs_gray")
-    authors = [author.strip() for author in authors.text.split(",")]
-    publisher = publisher.text
+    link = _PUB_LINK_SEL.select_one(soup)
+    name = _text(link)
+    authors, publisher = _PUB_DETAILS_SEL.select(soup)
+    authors = [author.strip() for author in _text(authors).split(",")]
+    publisher = _text(publisher)
 
-    ref = _HOST + soup.find("a", "gsc_a_at")["data-href"]
+    ref = _HOST + link["data-href"]
     iden = _CITATION_RE.search(ref).group(1)
-    cite_count = soup.find(class_="gsc_a_ac").text
+    cite_count = _PUB_CITES_SEL.select_one(soup).text
     if cite_count:
         cite_count = int(cite_count)
 
-    year = soup.find(class_="gsc_a_h").text
+    year = _PUB_YEAR_SEL.select_one(soup).text
     if year:
         year = int(year)
 
@@ -135,17 +174,17 @@ def parse_author_profile(soup) -> (Author, List[Publication], bool):
     iden = soup.find("div", id="gsc_md_fol-bdy").find("input", {"name": "user"})[
         "value"
     ]
-    name = soup.find("div", id="gsc_prf_in").text
+    name = _text(soup.find("div", id="gsc_prf_in"))
     url_picture = soup.find("img", id="gsc_prf_pup-img").src
 
-    email = soup.find("div", "gsc_prf_il").text
+    email = _text(soup.find("div", "gsc_prf_il"))
     if email:
         email = email.replace("Verified email at ", "")
 
-    affiliation = soup.find("div", class_="gsc_prf_il").text
-    interests = [i.text.strip() for i in soup.find_all("a", class_="gsc_prf_inta")]
+    affiliation = _text(soup.find("div", class_="gsc_prf_il"))
+    interests = [_text(i).strip() for i in _PROFILE_INTEREST_SEL.select(soup)]
 
-    indices = soup.find_all("td", class_="gsc_rsb_std")
+    indices = _PROFILE_INDEX_SEL.select(soup)
     if indices:
         cited_by = int(indices[0].text)
         cited_by5y = int(indices[1].text)
@@ -161,20 +200,20 @@ def parse_author_profile(soup) -> (Author, List[Publication], bool):
         i10index = None
         i10index5y = None
 
-    cites_per_year = dict(
-        zip(
-            (int(y.text) for y in soup.find_all("span", class_="gsc_g_t")),
-            (int(c.text) for c in soup.find_all("span", class_="gsc_g_al")),
+    cites_per_year = {
+        int(y.text): int(c.text)
+        for y, c in zip(
+            _PROFILE_YEAR_SEL.select(soup), _PROFILE_YEAR_CITES_SEL.select(soup)
         )
-    )
+    }
 
     coauthors = []
-    for row in soup.find_all("span", class_="gsc_rsb_a_desc"):
+    for row in _PROFILE_COAUTHOR_SEL.select(soup):
         coauthors.append(
             {
                 "id": _USER_RE.search(row.find("a")["href"]).group(1),
-                "name": row.find(tabindex=-1).text,
-                "affiliation": row.find(class_="gsc_rsb_a_ext").text,
+                "name": _text(row.find(tabindex=-1)),
+                "affiliation": _text(row.find(class_="gsc_rsb_a_ext")),
             }
         )
 
@@ -206,10 +245,10 @@ def parse_author_profile(soup) -> (Author, List[Publication], bool):
 
 def parse_author_profile_publications(soup) -> (List[Publication], bool):
     publications = []
-    for row in soup.find_all("tr", class_="gsc_a_tr"):
+    for row in _PUB_ROW_SEL.select(soup):
         publications.append(_analyze_basic_publication_soup(row))
 
-    has_offset = "disabled" not in soup.find("button", id="gsc_bpf_more").attrs
+    has_offset = "disabled" not in _PUB_MORE_SEL.select_one(soup).attrs
     return publications, has_offset
 
 
@@ -224,7 +263,7 @@ def _parse_year(date):
 
 def parse_publication(soup) -> (Publication, str):
     iden = soup.find("input", id="gsc_vcd_cid")["value"]
-    title = soup.find("div", id="gsc_vcd_title").text
+    title = _text(soup.find("div", id="gsc_vcd_title"))
     authors = None
     date = None
     journal = None
@@ -236,8 +275,8 @@ def parse_publication(soup) -> (Publication, str):
     citations_url = None
 
     for row in soup.find("div", id="gsc_vcd_table").children:
-        key = row.find("div", class_="gsc_vcd_field").text
-        val = row.find("div", class_="gsc_vcd_value").text
+        key = _text(row.find("div", class_="gsc_vcd_field"))
+        val = _text(row.find("div", class_="gsc_vcd_value"))
         if key == "Authors":
             authors = list(map(str.strip, val.split(",")))
         elif key == "Publication date":
@@ -282,19 +321,19 @@ def parse_publication(soup) -> (Publication, str):
 
 def parse_citations(soup) -> (List[Publication], Optional[str]):
     citations = []
-    for row in soup.find_all("div", "gs_or"):
-        a_val = row.find(class_="gs_a").text.split("-")[0]
+    for row in _CITATION_ROW_SEL.select(soup):
+        a_val = _text(row.find(class_="gs_a")).split("-")[0]
         abstract = row.find(class_="gs_rs")
         title = row.find("h3")
         title_ref = title.find("a")
         citations.append(
             Publication(
-                name=title.text,
+                name=_text(title),
                 authors=[
                     Author(full_name=author.strip()) for author in a_val.split(",")
                 ],
                 ref=title_ref["href"] if title_ref else None,
-                extra={"abstract": abstract.text if abstract else None},
+                extra={"abstract": _text(abstract) if abstract else None},
             )
         )
 
@@ -393,6 +432,7 @@ class CrawlScholar(Crawler):
                 session,
                 _URL_AUTHOR.format(user_author_id)
                 + f"&cstart={len(stage.known_pub_ids)}",
+                parse_only=_PUBLICATIONS_STRAINER,
             )
             self_publications, pubs_remain = parse_author_profile_publications(soup)
             known_pub_ids = stage.known_pub_ids + [p.id for p in self_publications]
@@ -1,20 +1,28 @@
 import abc
 import asyncio
 import heapq
-import json
 import logging
 import random
 import time
 import datetime
 from pathlib import Path
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, TCPConnector
 
+from .crawler import ERROR_DELAYS
 from .crawlers import CRAWLERS
 from .. import utils
 
 
 MAX_SLEEP = 60
+MAX_CONCURRENT_STEPS = 4
+
+# Steps come back to the same few hosts over and over, so keep the connections around
+# (crawler delays are long, but concurrent steps and citation pages can reuse them).
+CONNECTION_LIMIT = 64
+CONNECTION_LIMIT_PER_HOST = 8
+KEEPALIVE_TIMEOUT = 75
+DNS_CACHE_TTL = 5 * 60
 _log = logging.getLogger(__name__)
 
 
@@ -24,12 +32,29 @@ class Scheduler:
         self._enabled = enabled
         self._crawl_task = None
         self._crawl_notify = asyncio.Event()
-        self._client_session = ClientSession()
+        self._step_limit = asyncio.Semaphore(MAX_CONCURRENT_STEPS)
+        self._stepping = set()
+        self._step_tasks = set()
+        self._client_session = ClientSession(
+            connector=TCPConnector(
+                limit=CONNECTION_LIMIT,
+                limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=DNS_CACHE_TTL,
+            )
+        )
 
     async def _crawl(self):
         try:
             while True:
-                source = await self._db.next_source_task()
+                if self._step_limit.locked():
+                    # Every slot is busy, finishing steps will notify us
+                    await self._wait_notify(MAX_SLEEP)
+                    continue
+
+                # Only one step per source at a time, the same host shouldn't get concurrent
+                # requests (their rate limits are per client, not per user being crawled).
+                source = await self._db.next_source_task(exclude_keys=self._stepping)
                 if source is None:
                     await self._wait_notify(MAX_SLEEP)
                     continue
@@ -42,33 +67,77 @@ class Scheduler:
                 if await self._wait_notify(delay):
                     continue  # tasks changed so we don't want to step on any
 
-                _log.debug("stepping source task %s/%s", source.owner, source.key)
+                # Steps are mostly spent waiting on the network, so there's no need to wait
+                # on one source before stepping the next one that is due.
+                await self._step_limit.acquire()
+                self._stepping.add(source.key)
+                task = asyncio.create_task(self._step_source(source))
+                self._step_tasks.add(task)
+                task.add_done_callback(self._step_tasks.discard)
 
-                # TODO should these checks be here or in task? do crawlers expect empty values?
-                if source.values_json:
-                    values = json.loads(source.values_json)
-                else:
-                    values = {}
-                if source.task_json:
-                    state = json.loads(source.task_json)
-                else:
-                    state = None
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            _log.exception("unhandled exception in crawl task")
 
-                step = await CRAWLERS[source.key].step(
-                    values=values, state=state, session=self._client_session
-                )
-                await self._db.save_crawler_step(source, step)
-                _log.debug(
-                    "stepped source task %s/%s, next at %d",
-                    source.owner,
-                    source.key,
-                    step.due(),
-                )
+    async def _step_source(self, source):
+        release_later = False
+        try:
+            _log.debug("stepping source task %s/%s", source.owner, source.key)
+
+            # TODO should these checks be here or in task? do crawlers expect empty values?
+            if source.values_json:
+                values = utils.load_json(source.values_json)
+            else:
+                values = {}
+            if source.task_json:
+                state = utils.load_json(source.task_json)
+            else:
+                state = None
+
+            step = await CRAWLERS[source.key].step(
+                values=values, state=state, session=self._client_session
+            )
+            await self._db.save_crawler_step(source, step)
+            _log.debug(
+                "stepped source task %s/%s, next at %d",
+                source.owner,
+                source.key,
+                step.due(),
+            )
 
         except asyncio.CancelledError:
             raise
         except Exception:
-            _log.exception("unhandled exception in crawl task")
+            _log.exception(
+                "unhandled exception stepping source task %s/%s, retrying in %ds",
+                source.owner,
+                source.key,
+                ERROR_DELAYS[0],
+            )
+            # The task's due time was not updated, so it would be picked again right away
+            # (likely failing again, and delaying every other task of the same source).
+            try:
+                await self._db.delay_source_task(
+                    source, int(time.time()) + ERROR_DELAYS[0]
+                )
+            except Exception:
+                _log.exception(
+                    "failed to delay source task %s/%s", source.owner, source.key
+                )
+                release_later = True
+        finally:
+            self._step_limit.release()
+            if release_later:
+                asyncio.get_running_loop().call_later(
+                    ERROR_DELAYS[0], self._release_source, source.key
+                )
+            else:
+                self._release_source(source.key)
+
+    def _release_source(self, key):
+        self._stepping.discard(key)
+        self._crawl_notify.set()
 
     async def _wait_notify(self, delay):
         try:
@@ -150,10 +219,13 @@ class Scheduler:
             return
 
         self._crawl_task.cancel()
+        for task in self._step_tasks:
+            task.cancel()
         try:
             await self._crawl_task
         except asyncio.CancelledError:
             pass
         finally:
+            await asyncio.gather(*self._step_tasks, return_exceptions=True)
             self._crawl_task = None
             await self._client_session.__aexit__(exc_type, exc_val, exc_tb)
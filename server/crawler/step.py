@@ -1,9 +1,9 @@
 import time
 import random
-import json
 from dataclasses import dataclass, field, asdict
 from typing import Any, List, Mapping, Optional
 from ..storage import Author, Publication
+from .. import utils
 
 
 _DELAY_JITTER_PERCENT = 0.05
@@ -62,14 +62,14 @@ class Step:
 
     def stage_as_json(self):
         if self.stage is None:
-            return json.dumps(None)
+            return utils.dump_json(None)
 
         data = asdict(self.stage)
         data["_index"] = self.stage.INDEX
         if self.error is not None:
             data["_error"] = self.error
 
-        return json.dumps(data)
+        return utils.dump_json(data)
 
     def due(self):
         jitter_range = self.delay * _DELAY_JITTER_PERCENT
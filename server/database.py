@@ -1,17 +1,19 @@
 from aiosqlite import Connection
-from collections import namedtuple
+import asyncio
+from collections import defaultdict, namedtuple
 from dataclasses import asdict
 import itertools
 import sqlite3
+import sys
 import csv
 import zipfile
 import io
 import functools
-import json
+from . import utils
 from .storage import Publication as StepPublication
 from .merger import MergeCheck
 
-DB_VERSION = 1
+DB_VERSION = 2
 Version = namedtuple("Version", "version")
 User = namedtuple("User", "username password salt token")
 Source = namedtuple("Source", "owner key values_json task_json due")
@@ -35,15 +37,17 @@ def _transaction(func):
             # Already in a transaction
             return await func(self, *args, **kwargs)
 
-        async with self._db.execute("BEGIN") as cursor:
-            try:
-                ret = await func(self, *args, cursor=cursor, **kwargs)
-            except sqlite3.Error:
-                await cursor.execute("ROLLBACK")
-                raise
-            else:
-                await cursor.execute("COMMIT")
-            return ret
+        # There is a single connection, so concurrent tasks must not interleave transactions
+        async with self._transaction_lock:
+            async with self._db.execute("BEGIN") as cursor:
+                try:
+                    ret = await func(self, *args, cursor=cursor, **kwargs)
+                except sqlite3.Error:
+                    await cursor.execute("ROLLBACK")
+                    raise
+                else:
+                    await cursor.execute("COMMIT")
+                return ret
 
     return wrapped
 
@@ -102,6 +106,14 @@ class Database:
 
     def __init__(self, path):
         self._db = Connection(lambda: sqlite3.connect(path, isolation_level=None))
+        self._transaction_lock = asyncio.Lock()
+
+        # `get_publications` is used by every page load, but publications only change when
+        # crawling or merging, so the result is kept around until the user's data changes.
+        # The version is bumped on every change, so that results which were being built
+        # while a change happened are not cached.
+        self._publications_cache = {}
+        self._publications_version = defaultdict(int)
 
     async def __aenter__(self):
         await self._db
@@ -113,7 +125,7 @@ class Database:
             await self._create_tables()
         else:
             if tup.version != DB_VERSION:
-                await self._upgrade_tables()
+                await self._upgrade_tables(tup.version)
 
         return self
 
@@ -148,6 +160,8 @@ class Database:
             PRIMARY KEY(owner, key)
         ) WITHOUT ROWID"""
         )
+        # The scheduler always looks for the source task that is due the soonest
+        await cursor.execute("CREATE INDEX SourceDue ON Source(due)")
         await cursor.execute(
             """CREATE TABLE Author (
             owner TEXT,
@@ -224,8 +238,11 @@ class Database:
         await cursor.execute("INSERT INTO Version VALUES (?)", (DB_VERSION,))
 
     @_transaction
-    async def _upgrade_tables(self, cursor=None):
-        pass
+    async def _upgrade_tables(self, version, cursor=None):
+        if version < 2:
+            await cursor.execute("CREATE INDEX SourceDue ON Source(due)")
+
+        await cursor.execute("UPDATE Version SET version = ?", (DB_VERSION,))
 
     # Convenience
 
@@ -240,22 +257,22 @@ class Database:
         async with Select(self._db, table, query, args) as select:
             return await select.all()
 
+    async def _insert_many(self, statement, tuples):
+        # Rows for the same table are sent in a single call rather than one per row
+        for table, rows in itertools.groupby(tuples, key=type):
+            rows = list(rows)
+            fields = ",".join("?" * len(rows[0]))
+            await self._db.executemany(
+                f"{statement} INTO {table.__name__} VALUES ({fields})", rows
+            )
+
     @_transaction
     async def _insert(self, *tuples, cursor=None):
-        for tup in tuples:
-            fields = ",".join("?" * len(tup))
-            await self._db.execute(
-                f"INSERT INTO {tup.__class__.__name__} VALUES ({fields})", tup
-            )
+        await self._insert_many("INSERT", tuples)
 
     @_transaction
     async def _insert_or_replace(self, *tuples, cursor=None):
-        for tup in tuples:
-            fields = ",".join("?" * len(tup))
-            await self._db.execute(
-                f"INSERT OR REPLACE INTO {tup.__class__.__name__} VALUES ({fields})",
-                tup,
-            )
+        await self._insert_many("INSERT OR REPLACE", tuples)
 
     @_transaction
     async def _execute(self, query, *args, cursor=None):
@@ -281,6 +298,7 @@ class Database:
 
     async def delete_user(self, *, username):
         rowcount = await self._execute("DELETE FROM User WHERE username = ?", username)
+        self._invalidate_publications(username)
         return rowcount != 0
 
     async def update_user_password(self, *, username, password, salt):
@@ -303,20 +321,26 @@ class Database:
         user = await self._select_one(User, "WHERE username = ?", username)
         return user is not None
 
-    async def next_source_task(self):
-        return await self._select_one(Source, "ORDER BY due ASC LIMIT 1")
+    async def next_source_task(self, *, exclude_keys=()):
+        exclude_keys = tuple(exclude_keys)
+        placeholders = ",".join("?" * len(exclude_keys))
+        return await self._select_one(
+            Source,
+            f"WHERE key NOT IN ({placeholders}) ORDER BY due ASC LIMIT 1",
+            *exclude_keys,
+        )
 
     async def get_source_values(self, username):
         result = {}
         async with self._select(Source, "WHERE owner = ?", username) as select:
             async for source in select:
-                result[source.key] = json.loads(source.values_json)
+                result[source.key] = utils.load_json(source.values_json)
         return result
 
     @_transaction
     async def update_source_values(self, username, sources, *, cursor=None):
         for source, fields in sources.items():
-            values_json = json.dumps(fields)
+            values_json = utils.dump_json(fields)
             rowcount = await self._execute(
                 "UPDATE Source SET values_json = ?, due = 0 WHERE owner = ? AND key = ?",
                 values_json,
@@ -338,77 +362,95 @@ class Database:
 
     @_transaction
     async def save_crawler_step(self, source, step, *, cursor=None):
-        # Use `_insert_or_replace` under the premise that sources may omit
-        # information entirely, but not provide less information about what
-        # is known (so replacing old data won't produce any loss).
-        await self._insert_or_replace(
-            *(
-                Author(
-                    owner=source.owner,
-                    source=source.key,
-                    path=author.unique_path_name(),
-                    full_name=author.full_name,
-                    id=author.id,
-                    first_name=author.first_name,
-                    last_name=author.last_name,
-                    extra_json=json.dumps(author.extra),
-                )
-                for author in step.authors
-            ),
-            cursor=cursor,
-        )
-        await self._insert_or_replace(
-            *(
-                Publication(
-                    owner=source.owner,
-                    source=source.key,
-                    path=pub.unique_path_name(),
-                    by_self=by_self,
-                    name=pub.name,
-                    id=pub.id,
-                    year=pub.year,
-                    ref=pub.ref,
-                    extra_json=json.dumps(pub.extra),
-                )
+        # Readers may have seen rows from this transaction which are not committed yet,
+        # so the cache is invalidated whether the changes go through or are rolled back.
+        try:
+            # Use `_insert_or_replace` under the premise that sources may omit
+            # information entirely, but not provide less information about what
+            # is known (so replacing old data won't produce any loss).
+            await self._insert_or_replace(
+                *(
+                    Author(
+                        owner=source.owner,
+                        source=source.key,
+                        path=author.unique_path_name(),
+                        full_name=author.full_name,
+                        id=author.id,
+                        first_name=author.first_name,
+                        last_name=author.last_name,
+                        extra_json=utils.dump_json(author.extra),
+                    )
+                    for author in step.authors
+                ),
+                cursor=cursor,
+            )
+            pubs = [
+                (pub, pub.unique_path_name(), by_self)
                 for pub, by_self in _adapt_step_publications(step)
-            ),
-            cursor=cursor,
-        )
-        for pub, _ in _adapt_step_publications(step):
+            ]
+            await self._insert_or_replace(
+                *(
+                    Publication(
+                        owner=source.owner,
+                        source=source.key,
+                        path=pub_path,
+                        by_self=by_self,
+                        name=pub.name,
+                        id=pub.id,
+                        year=pub.year,
+                        ref=pub.ref,
+                        extra_json=utils.dump_json(pub.extra),
+                    )
+                    for pub, pub_path, by_self in pubs
+                ),
+                cursor=cursor,
+            )
             await self._insert_or_replace(
                 *(
                     PublicationAuthors(
                         owner=source.owner,
                         source=source.key,
-                        pub_path=pub.unique_path_name(),
+                        pub_path=pub_path,
                         author_path=author_path,
                     )
+                    for pub, pub_path, _ in pubs
                     for author_path in pub.authors
                 ),
                 cursor=cursor,
             )
-        for cites_pub_id, citations in step.citations.items():
             # TODO bad (maybe the step should have a method to get all the tuples to insert?)
-            pub_path = StepPublication(name="", id=cites_pub_id).unique_path_name()
             await self._insert_or_replace(
                 *(
                     Cites(
                         owner=source.owner,
                         source=source.key,
-                        pub_path=pub_path,
+                        pub_path=StepPublication(
+                            name="", id=cites_pub_id
+                        ).unique_path_name(),
                         cited_by=cit.unique_path_name(),
                     )
+                    for cites_pub_id, citations in step.citations.items()
                     for cit in citations
                 ),
                 cursor=cursor,
             )
+            await self._execute(
+                "UPDATE Source SET task_json = ?, due = ? WHERE owner = ? AND key = ?",
+                step.stage_as_json(),
+                step.due(),
+                source.owner,
+                source.key,
+                cursor=cursor,
+            )
+        finally:
+            self._invalidate_publications(source.owner)
+
+    async def delay_source_task(self, source, due):
         await self._execute(
-            "UPDATE Source SET task_json = ?, due = ? WHERE owner = ? AND key = ?",
-            step.stage_as_json(),
-            step.due(),
+            "UPDATE Source SET due = ? WHERE owner = ? AND key = ?",
+            due,
             source.owner,
             source.key,
-            cursor=cursor,
         )
 
     async def get_usernames(self):
@@ -425,25 +467,40 @@ class Database:
 
     @_transaction
     async def save_merges(self, username, merges, *, cursor=None):
-        await self._execute(
-            "DELETE FROM Merge WHERE owner = ?", username, cursor=cursor
-        )
-        await self._insert(
-            *(
-                Merge(
-                    owner=username,
-                    source_a=m.source_a,
-                    source_b=m.source_b,
-                    pub_a=m.pub_a,
-                    pub_b=m.pub_b,
-                    similarity=m.similarity,
-                )
-                for m in merges
-            ),
-            cursor=cursor,
-        )
+        # Readers may have seen rows from this transaction which are not committed yet,
+        # so the cache is invalidated whether the changes go through or are rolled back.
+        try:
+            await self._execute(
+                "DELETE FROM Merge WHERE owner = ?", username, cursor=cursor
+            )
+            await self._insert(
+                *(
+                    Merge(
+                        owner=username,
+                        source_a=m.source_a,
+                        source_b=m.source_b,
+                        pub_a=m.pub_a,
+                        pub_b=m.pub_b,
+                        similarity=m.similarity,
+                    )
+                    for m in merges
+                ),
+                cursor=cursor,
+            )
+        finally:
+            self._invalidate_publications(username)
+
+    def _invalidate_publications(self, username):
+        self._publications_version[username] += 1
+        self._publications_cache.pop(username, None)
 
     async def get_publications(self, username):
+        # The returned list is shared between callers and must not be modified
+        result = self._publications_cache.get(username)
+        if result is not None:
+            return result
+
+        version = self._publications_version[username]
         publications = {}
         async with self._db.execute(
             """
@@ -487,20 +544,26 @@ class Database:
                 author_name,
                 cit_path,
             ) in cursor:
+                # Every row carries its own copy of one of the few source keys
+                source = sys.intern(source)
                 pubs = publications.setdefault(source, {})
-                if pub_path in pubs:
-                    pubs[pub_path]["author_names"].add(author_name)
-                    pubs[pub_path]["cites"].add(cit_path)
-                else:
-                    pubs[pub_path] = {
+                pub = pubs.get(pub_path)
+                if pub is None:
+                    pub = pubs[pub_path] = {
                         "ref": ref,
                         "name": pub_name,
-                        "author_names": {author_name},
-                        "cites": {cit_path},
+                        "author_names": set(),
+                        "cites": set(),
                         "year": year,
                         "by_self": by_self != 0,
                     }
 
+                pub["author_names"].add(author_name)
+                # The null cite of an uncited publication (from the left join) must not
+                # count as a cite, or every uncited publication would have one.
+                if cit_path is not None:
+                    pub["cites"].add(cit_path)
+
         # Separate queries make this process a bit less tedious
         merges = MergeCheck(await self._select_all(Merge, "WHERE owner = ?", username))
 
@@ -561,6 +624,9 @@ class Database:
                 value["cites"] = cites
                 result.append(value)
 
+        if version == self._publications_version[username]:
+            self._publications_cache[username] = result
+
         return result
 
     async def _export_table_as_csv(self, table, owner, fields):
@@ -624,6 +690,4 @@ if __name__ == "__main__":
         async with Database("../uex.db") as db:
             await db.get_publications("admin")
 
-    import asyncio
-
     asyncio.run(main())
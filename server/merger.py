@@ -2,6 +2,7 @@ import re
 import itertools
 import asyncio
 import logging
+import sys
 from collections import defaultdict
 from dataclasses import asdict, dataclass
 from pathlib import Path
@@ -14,31 +15,46 @@ SIMILARITY_THRESHOLD = 0.9
 _log = logging.getLogger(__name__)
 
 
-def similarity(a, b, _words_re=re.compile(r"\w+")):
+def _title_words(pub, _words_re=re.compile(r"\w+")):
+    return _words_re.findall(pub.name.lower())
+
+
+def similarity(a, b):
     # This function can obviously apply more complex heuristics, but in reality this works
     # good enough and it's nearly as simple as we can get while tolerating some differences.
-    title_a = _words_re.findall(a.name.lower())
-    title_b = _words_re.findall(b.name.lower())
-    if title_a == title_b:
+    if _title_words(a) == _title_words(b):
         return 1.0
     else:
         return 0.0
 
 
+def _title_buckets(pubs):
+    # Only publications with the same title can be similar, so they're grouped by title
+    # and only compared within their group (if `similarity` ever becomes fuzzier, the key
+    # should be relaxed too, for example, to the first few words of the title).
+    #
+    # The words are joined into a single string because strings cache their hash, so the
+    # many lookups done with the same key don't need to rehash every word (as tuples do).
+    buckets = defaultdict(list)
+    for pub in pubs:
+        buckets[" ".join(_title_words(pub))].append(pub)
+    return buckets
+
+
 class MergeCheck:
     def __init__(self, merges):
         # {source: {path: [(related source, related path)]}}
         self._relations = defaultdict(lambda: defaultdict(list))
         for merge in merges:
-            self._relations[merge.source_a][merge.pub_a].append(
-                (merge.source_b, merge.pub_b)
-            )
-            self._relations[merge.source_b][merge.pub_b].append(
-                (merge.source_a, merge.pub_a)
-            )
+            # Rows come from the database, each with its own copy of the few source keys
+            source_a = sys.intern(merge.source_a)
+            source_b = sys.intern(merge.source_b)
+            self._relations[source_a][merge.pub_a].append((source_b, merge.pub_b))
+            self._relations[source_b][merge.pub_b].append((source_a, merge.pub_a))
 
     def get_related(self, source, path):
-        return self._relations[source][path]
+        # Most paths have no relations, so avoid creating empty entries for every lookup
+        return self._relations.get(source, {}).get(path, ())
 
 
 @dataclass
@@ -82,28 +98,35 @@ class Merger:
             await self._merge_user(username)
 
     async def _merge_user(self, username):
+        # Every source takes part in several pairs, so its titles are only grouped once
+        buckets = {}
+        for source in CRAWLERS:
+            pubs = await self._db.get_source_publications(username, source)
+            buckets[source] = _title_buckets(pubs)
+
         result = []
         for (source_a, source_b) in itertools.combinations(CRAWLERS, 2):
             _log.debug("checking merges between %s and %s", source_a, source_b)
-            pubs_a = await self._db.get_source_publications(username, source_a)
-            pubs_b = await self._db.get_source_publications(username, source_b)
-            for (pub_a, pub_b) in itertools.product(pubs_a, pubs_b):
-                sim = similarity(pub_a, pub_b)
-                if sim >= SIMILARITY_THRESHOLD:
-                    result.append(
-                        Merge(
-                            source_a=source_a,
-                            source_b=source_b,
-                            pub_a=pub_a.path,
-                            pub_b=pub_b.path,
-                            similarity=sim,
+            buckets_b = buckets[source_b]
+            for title, bucket_a in buckets[source_a].items():
+                bucket_b = buckets_b.get(title, ())
+                for (pub_a, pub_b) in itertools.product(bucket_a, bucket_b):
+                    sim = similarity(pub_a, pub_b)
+                    if sim >= SIMILARITY_THRESHOLD:
+                        result.append(
+                            Merge(
+                                source_a=source_a,
+                                source_b=source_b,
+                                pub_a=pub_a.path,
+                                pub_b=pub_b.path,
+                                similarity=sim,
+                            )
                         )
-                    )
 
-                # Yielding control to the event loop for every publication pair seems to do
-                # a pretty good job, and the web server is able to respond while we do this
-                # even if it's pretty CPU intensive (although IO loads may play a big role).
-                await asyncio.sleep(0)
+            # The merger runs in its own task, and comparing a pair of sources is cheap now
+            # that only equal titles are compared, so yielding control to the event loop
+            # once per pair is enough for the web server to keep responding meanwhile.
+            await asyncio.sleep(0)
 
         await self._db.save_merges(username, result)
 
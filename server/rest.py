@@ -75,14 +75,6 @@ async def get_metrics(request, username):
 
     cit_count.sort(reverse=True)
 
-    # Largest number "h" such that "h" publications have "h" or more citations.
-    h_index = 0
-    for i, cc in enumerate(cit_count, start=1):
-        if cc >= i:
-            h_index = i
-        else:
-            break
-
     # Number of publications with at least # citations (this list starts at 1).
     i_indices = [0] * MAX_I_INDEX
     for cc in cit_count:
@@ -94,8 +86,12 @@ async def get_metrics(request, username):
         i_indices[i - 1] += i_indices[i]
 
     # Largest number "g" such that "g" articles have "g²" or more citations in total.
+    # Largest number "h" such that "h" publications have "h" or more citations.
+    # If "h" publications have "h" citations each they have "h²" in total, so "g >= h"
+    # and both can be found in the same pass (which can stop as soon as "g" is found).
     g_index = 0
     g_sum = 0
+    h_index = 0
     for i, cc in enumerate(cit_count, start=1):
         g_sum += cc
         if g_sum >= i ** 2:
@@ -103,6 +99,9 @@ async def get_metrics(request, username):
         else:
             break
 
+        if cc >= i:
+            h_index = i
+
     # e² = sum[j in 1..h](cit_j - h)
     e_index = (sum(cit_count[:h_index]) - h_index ** 2) ** 0.5
 
@@ -120,7 +119,9 @@ async def get_metrics(request, username):
 
 @_require_user
 async def get_publications(request, username):
-    return web.json_response(await request.app["db"].get_publications(username))
+    return web.json_response(
+        await request.app["db"].get_publications(username), dumps=utils.dump_json
+    )
 
 
 @_require_user
@@ -1,3 +1,4 @@
+import functools
 import hashlib
 import json
 import uuid
@@ -9,6 +10,8 @@ from typing import List, Optional
 from . import utils
 
 
+# The same identifiers are hashed several times while saving a single step
+@functools.lru_cache(maxsize=4096)
 def filename_for(identifier):
     # `identifier` may consist of invalid path characters such as '/', but the paths still need
     # to be unique. We can't use `base64` because paths are case insensitive on some systems so
@@ -4,6 +4,7 @@
 from . import utils
 from aiohttp import web
 from pathlib import Path
+import asyncio
 import os
 import base64
 import re
@@ -27,6 +28,13 @@ def _check_password(password):
         )
 
 
+async def _hash_user_pass(password, salt=None):
+    # Hashing is slow on purpose, so it runs in a thread to not block other requests meanwhile
+    return await asyncio.get_running_loop().run_in_executor(
+        None, utils.hash_user_pass, password, salt
+    )
+
+
 class Users:
     def __init__(self, db):
         self._db = db
@@ -47,7 +55,7 @@ class Users:
 
         _check_password(password)
 
-        password, salt = utils.hash_user_pass(password)
+        password, salt = await _hash_user_pass(password)
         token = await self._gen_token()
         await self._db.register_user(
             username=username, password=password, salt=salt, token=token,
@@ -62,7 +70,7 @@ class Users:
             raise bad_info
 
         saved_password, salt = details
-        password, _ = utils.hash_user_pass(password, salt)
+        password, _ = await _hash_user_pass(password, salt)
 
         if not hmac.compare_digest(password, saved_password):
             raise bad_info
@@ -83,13 +91,13 @@ class Users:
     async def change_password(self, username, old_password, new_password):
         saved_password, salt = await self._db.get_user_password(username=username)
 
-        old_password, _ = utils.hash_user_pass(old_password, salt)
+        old_password, _ = await _hash_user_pass(old_password, salt)
         if not hmac.compare_digest(old_password, saved_password):
             raise web.HTTPBadRequest(reason="old password did not match")
 
         _check_password(new_password)
 
-        password, salt = utils.hash_user_pass(new_password)
+        password, salt = await _hash_user_pass(new_password)
         await self._db.update_user_password(
             username=username, password=password, salt=salt
         )
@@ -2,6 +2,8 @@ import hashlib
 import os
 import base64
 
+import orjson
+
 
 PASSWORD_HASH_ITERATIONS = 100_000
 
@@ -23,6 +25,16 @@ def hash_user_pass(password, salt=None):
     )
 
 
+def dump_json(value) -> str:
+    # `orjson` is several times faster than `json` but produces `bytes`, and
+    # it needs to be told to stringify non-string keys as `json` would do.
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def load_json(value):
+    return orjson.loads(value)
+
+
 def parse_delay(delay):
     if not delay:
         return 0